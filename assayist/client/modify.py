@@ -36,19 +36,21 @@ def set_component_names(c_name, c_type, c_namespace='', alternatives=None):
         if not isinstance(alternative, str):
             raise ValueError('The alternatives keyword argument must only contain strings')
 
-    # Create a WHERE clause that checks to see if there is a component with the canonical name or
-    # alternative name with the passed in canonical name and alternatives
-    names_where_clause = [
-        'c.canonical_name = "{0}" OR "{0}" in c.alternative_names'.format(name)
-        for name in itertools.chain([c_name], alternatives)
-    ]
+    # Find the components whose canonical name or alternative names match the passed in canonical
+    # name or alternatives. The values are passed as parameters so that Neo4j can reuse the query
+    # plan across calls.
     query = """
-    MATCH (c:Component {{canonical_type: "{}", canonical_namespace: "{}" }})
-    WHERE {}
+    MATCH (c:Component {canonical_type: $type, canonical_namespace: $namespace})
+    WHERE c.canonical_name IN $names OR any(name IN c.alternative_names WHERE name IN $names)
     RETURN c
-    """.format(c_type, c_namespace, ' OR '.join(names_where_clause))
+    """
+    params = {
+        'type': c_type,
+        'namespace': c_namespace,
+        'names': list(itertools.chain([c_name], alternatives)),
+    }
 
-    results, _ = neomodel.db.cypher_query(query)
+    results, _ = neomodel.db.cypher_query(query, params)
     components = [Component.inflate(row[0]) for row in results]
 
     # If no matching component is returned, just create one
@@ -73,7 +75,7 @@ def set_component_names(c_name, c_type, c_namespace='', alternatives=None):
     if component.canonical_name != c_name:
         log.info(f'Setting the canonical name of "{c_name}" on "{component}"')
         component.canonical_name = c_name
-    if set(component.alternative_names) != set(all_alt_names):
+    if set(component.alternative_names) != all_alt_names:
         log.info(f'Setting the alternative names of "{all_alt_names}" on "{component}"')
         component.alternative_names = list(all_alt_names)
 
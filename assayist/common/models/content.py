@@ -49,7 +49,8 @@ class Artifact(AssayistStructuredNode):
     # Not unique because rpm and archive ids can overlap. Combination of archive_id and type
     # should be unique, but neo4j doesn't do compound unique indexes.
     archive_id = StringProperty(required=True, index=True)
-    filename = StringProperty()
+    # Indexed since the analyzers look up the artifacts they're analyzing by their file name
+    filename = StringProperty(index=True)
     # A one-word description of the type of file this describes (to aid in filtering)
     type_ = StringProperty(required=True, db_property='type', choices=TYPES, index=True)
 
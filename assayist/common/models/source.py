@@ -67,13 +67,19 @@ class Component(AssayistStructuredNode):
         :return: The saved component you requested.
         :rtype: Component
         """
+        # The values are passed as parameters so that Neo4j can reuse the query plan across calls
         query = """
-        MATCH (c:Component {{canonical_type: "{2}", canonical_namespace: "{0}" }})
-        WHERE c.canonical_name = "{1}" OR "{1}" in c.alternative_names
+        MATCH (c:Component {canonical_type: $type, canonical_namespace: $namespace})
+        WHERE c.canonical_name = $name OR $name IN c.alternative_names
         RETURN c
-        """.format(canonical_namespace, canonical_name, canonical_type)
+        """
+        params = {
+            'namespace': canonical_namespace,
+            'name': canonical_name,
+            'type': canonical_type,
+        }
 
-        results, _ = db.cypher_query(query)
+        results, _ = db.cypher_query(query, params)
         if results:
             # There should only be one, because set_component_names de-duplicates as it adds
             # alternative_names.
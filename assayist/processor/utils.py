@@ -1,15 +1,37 @@
 # SPDX-License-Identifier: GPL-3.0+
 
+import collections
+import concurrent.futures
+import fcntl
+import functools
+import itertools
 import json
 import os
-import re
 import shutil
+import signal
+import stat
 import subprocess
 import tarfile
+import tempfile
+import threading
 import zipfile
 from urllib import parse
 
 import koji
+try:
+    import libarchive
+except ImportError:  # pragma: no cover
+    libarchive = None
+else:
+    # RPMs are only unpacked with libarchive when the paths of its entries can be changed, which
+    # older releases of libarchive-c (such as 2.8 in Fedora 28) don't support
+    if not all(getattr(getattr(libarchive.entry.ArchiveEntry, attr, None), 'fset', None)
+               for attr in ('pathname', 'linkpath')):  # pragma: no cover
+        libarchive = None
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
 
 from assayist.processor.configuration import config
 from assayist.processor.error import (
@@ -17,16 +39,80 @@ from assayist.processor.error import (
 )
 from assayist.processor.logging import log
 
+# The URL prefixes Koji uses for Git sources in task requests
+GIT_URL_PREFIXES = ('git://', 'git+http://', 'git+https://', 'git+ssh://')
+# The maximum number of bytes of a failed command's error output to keep for the error message
+ERROR_OUTPUT_LIMIT = 64 * 1024
+# The maximum number of "koji download-build" commands to run at the same time, since a build can
+# have RPMs for many architectures and each command is a separate process with its own downloads
+MAX_CONCURRENT_DOWNLOADS = 4
+# The size of the reads when streaming container images, which can be hundreds of megabytes. The
+# tarfile default is 10 KiB, which results in a read system call for every 10 KiB of the image.
+TAR_STREAM_BUFSIZE = 1024 * 1024
+# The size of the pipe between rpm2cpio and cpio. Linux defaults to 64 KiB, and 1 MiB is the default
+# maximum for unprivileged processes (see /proc/sys/fs/pipe-max-size).
+RPM_PIPE_SIZE = 1024 * 1024
+# The fcntl module only has this constant starting in Python 3.10
+F_SETPIPE_SZ = getattr(fcntl, 'F_SETPIPE_SZ', 1031)
+# The type of archive an artifact is, by the artifact's extension. Artifacts with other extensions
+# are inspected to determine if they're archives.
+ARCHIVE_TYPES_BY_EXTENSION = {
+    '.rpm': 'rpm',
+    '.ear': 'zip',
+    '.jar': 'zip',
+    '.war': 'zip',
+    '.zip': 'zip',
+    '.tar': 'tar',
+    '.tar.bz2': 'tar',
+    '.tar.gz': 'tar',
+    '.tar.xz': 'tar',
+    '.tgz': 'tar',
+}
+
+
+# The Koji sessions created by get_koji_session, one per thread
+_koji_sessions = threading.local()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_koji_profile():  # pragma: no cover
+    """
+    Load the configured Koji profile.
+
+    :return: the Koji profile module
+    :rtype: module
+    """
+    return koji.get_profile_module(config.koji_profile)
+
 
 def get_koji_session():  # pragma: no cover
     """
     Generate a Koji session.
 
+    The profile is only loaded once, and each thread creates one session that is then reused for
+    the rest of its life, so that the connection to the hub can be reused. A session isn't
+    thread-safe (e.g. its multicall mode is shared), so a session is never shared across threads.
+
     :return: a Koji session
     :rtype: koji.ClientSession
     """
-    profile = koji.get_profile_module(config.koji_profile)
-    return koji.ClientSession(profile.config.server)
+    session = getattr(_koji_sessions, 'session', None)
+    if session is None:
+        session = koji.ClientSession(_get_koji_profile().config.server)
+        _koji_sessions.session = session
+    return session
+
+
+@functools.lru_cache(maxsize=None)
+def _which(cmd_name):
+    """
+    Find the path to a command, caching the result since $PATH doesn't change during a run.
+
+    :param str cmd_name: the name of the command to look up
+    :return: the path to the command or None if it's not found
+    :rtype: str
+    """
+    return shutil.which(cmd_name)
 
 
 def assert_command(cmd_name):
@@ -35,10 +121,46 @@ def assert_command(cmd_name):
 
     :raises RuntimeError: if the command is not installed
     """
-    if not shutil.which(cmd_name):
+    if not _which(cmd_name):
         raise RuntimeError(f'The command "{cmd_name}" is not installed and is required')
 
 
+def _run_command(cmd, **kwargs):
+    """
+    Run a command and wait for it to finish.
+
+    The error output is spooled to a temporary file instead of a pipe, and only its tail is read
+    back if the command fails, so that a very verbose command can't exhaust the memory.
+
+    :param list cmd: the command to run
+    :param kwargs: additional keyword arguments to pass to subprocess.Popen
+    :return: a tuple of the return code, the standard output (if captured) and the tail of the
+        error output (only populated on failure)
+    :rtype: tuple
+    """
+    with tempfile.TemporaryFile() as error_file:
+        process = subprocess.Popen(cmd, stderr=error_file, **kwargs)
+        output, _ = process.communicate()
+        error_output = ''
+        if process.returncode != 0:
+            error_output = _read_error_output(error_file)
+
+    return process.returncode, output, error_output
+
+
+def _read_error_output(error_file):
+    """
+    Read the tail of a command's error output that was spooled to a file.
+
+    :param file error_file: the binary file the command's error output was written to
+    :return: at most the last ERROR_OUTPUT_LIMIT bytes of the error output
+    :rtype: str
+    """
+    error_file.seek(0, os.SEEK_END)
+    error_file.seek(max(0, error_file.tell() - ERROR_OUTPUT_LIMIT))
+    return error_file.read().decode('utf-8', errors='replace')
+
+
 def write_file(data, in_dir, in_file):
     """
     Write the data to the specified JSON file.
@@ -47,8 +169,15 @@ def write_file(data, in_dir, in_file):
     :param str in_file: The name of the input file to read. Probably one of the class constants.
     :param str in_dir: The directory the file is in.
     """
-    with open(os.path.join(in_dir, in_file), 'w') as f:
-        json.dump(data, f)
+    file_path = os.path.join(in_dir, in_file)
+    # orjson is much faster on large Koji listings, so use it when it's installed. The image RPMs
+    # and buildroot components are keyed by integer IDs, which the json module converts to strings.
+    if orjson is not None:
+        with open(file_path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(file_path, 'w') as f:
+            json.dump(data, f)
 
 
 def get_build_type(build_info, task_info):
@@ -89,8 +218,8 @@ def download_build_data(build_identifier, output_dir='/metadata'):
     :param str/int build_identifier: the string of the builds NVR or the integer of the build ID
     :param str output_dir: the path to download the brew info to
     :raises BuildSourceNotFound: when the source can't be determined
-    :return: build information
-    :rtype: dict
+    :return: the build information, and the lists of the RPMs and archives of the build
+    :rtype: tuple
     :raises BuildTypeNotSupported: when the build type is not supported for analysis
     """
     # Import this here to avoid a circular import
@@ -104,12 +233,6 @@ def download_build_data(build_identifier, output_dir='/metadata'):
     if state != koji.BUILD_STATES['COMPLETE']:
         raise BuildInvalidState(f'Build {build_identifier} state is {state}; skipping analysis')
 
-    if not build.get('source'):
-        # Sometimes there is no source url on the build but it can be found in the task
-        # request info instead. Try looking there, and if found update the build info
-        # so the analyzers have a nice consistent place to find it.
-        build['source'] = get_source_of_build(build)
-
     # Get task info
     task = None
     if 'task_id' in build and build['task_id']:
@@ -120,29 +243,41 @@ def download_build_data(build_identifier, output_dir='/metadata'):
     # without having to perform the heuristic below themselves.
     build_type = get_build_type(build, task)
     build['type'] = build_type
-    write_file(build, output_dir, Analyzer.BUILD_FILE)
 
     # Exit early if the type of this build is not supported since none of the analyzers will do
-    # anything meaningful with the data downloaded below anyway.
+    # anything meaningful with the data downloaded below anyway. The build metadata is still
+    # written since it's all that's needed to create the Build node.
     if build_type not in Analyzer.SUPPORTED_BUILD_TYPES:
+        write_file(build, output_dir, Analyzer.BUILD_FILE)
         if build_type is None:
             raise BuildTypeNotFound(f'Could not determine build type for build {build_identifier}')
 
         raise BuildTypeNotSupported(
             f'Build {build_identifier} type "{build_type}" is not supported for analysis')
 
-    # Get maven info
-    maven = koji_session.getMavenBuild(build_identifier)
+    if not build.get('source'):
+        # Sometimes there is no source url on the build but it can be found in the task
+        # request info instead. Try looking there, and if found update the build info
+        # so the analyzers have a nice consistent place to find it.
+        build['source'] = get_source_of_build(build)
+
+    write_file(build, output_dir, Analyzer.BUILD_FILE)
+
+    # Get the maven info, the list of RPMs, and the list of archives in a single call since they
+    # don't depend on each other. Use the build ID from the build info that was already fetched so
+    # that Koji doesn't have to look the build up by its NVR again for each of the calls.
+    koji_session.multicall = True
+    koji_session.getMavenBuild(build['id'])
+    koji_session.listRPMs(build['id'])
+    koji_session.listArchives(build['id'])
+    maven, rpms, archives = [result[0] for result in koji_session.multiCall(strict=True)]
+
     if maven:
         write_file(maven, output_dir, Analyzer.MAVEN_FILE)
 
-    # Get list of RPMs
-    rpms = koji_session.listRPMs(build_identifier)
     if rpms:
         write_file(rpms, output_dir, Analyzer.RPM_FILE)
 
-    # Get list of archives
-    archives = koji_session.listArchives(build_identifier)
     if archives:
         write_file(archives, output_dir, Analyzer.ARCHIVE_FILE)
 
@@ -180,15 +315,57 @@ def download_build_data(build_identifier, output_dir='/metadata'):
     if buildroot_components:
         write_file(buildroot_components, output_dir, Analyzer.BUILDROOT_FILE)
 
-    return build
+    return build, rpms, archives
+
+
+def _download_build_artifacts(download_cmd, output_dir):
+    """
+    Download the artifacts of a single type associated with a Koji build.
+
+    :param list download_cmd: the "koji download-build" command to run
+    :param str output_dir: the path to download the archives to
+    :return: a list of downloaded artifacts
+    :rtype: list
+    """
+    download_prefix = b'Downloading: '
+    artifacts = []
+    # For some reason, any errors are streamed to stdout and not stderr, so keep the last lines that
+    # aren't about a download to report them if the command fails
+    other_output = collections.deque(maxlen=100)
+
+    # Process the output as it's produced instead of holding the whole download log in memory. The
+    # output is read as bytes since most of it is progress bars, so only the lines that are needed
+    # get decoded.
+    p = subprocess.Popen(download_cmd, cwd=output_dir, stdout=subprocess.PIPE)
+    with p.stdout:
+        for line in p.stdout:
+            if line.startswith(download_prefix):
+                file_path = os.path.join(
+                    output_dir,
+                    line[len(download_prefix):].rstrip(b'\r\n').decode('utf-8').lstrip('/'))
+                artifacts.append(file_path)
+                log.info(f'Downloading {os.path.basename(file_path)}')
+            else:
+                other_output.append(line)
 
+    if p.wait() != 0:
+        output = b''.join(other_output).decode('utf-8', errors='replace')
+        if 'No' in output and 'available' in output:
+            return []
+        raise RuntimeError(f'The command "{" ".join(download_cmd)}" failed with: {output}')
 
-def download_build(build_info, output_dir):
+    return artifacts
+
+
+def download_build(build_info, output_dir, rpms=None, archives=None):
     """
     Download the artifacts associated with a Koji build.
 
     :param dict build_info: the build information from koji
     :param str output_dir: the path to download the archives to
+    :param list rpms: the RPMs of the build, as returned by download_build_data; if either this or
+        archives isn't provided, both are retrieved from Koji
+    :param list archives: the archives of the build, as returned by download_build_data
     :return: a list of downloaded artifacts
     :rtype: list
     """
@@ -200,38 +377,45 @@ def download_build(build_info, output_dir):
     if not build_info:
         raise RuntimeError(f'The Koji build cannot be None')
 
+    if rpms is None or archives is None:
+        koji_session = get_koji_session()
+        koji_session.multicall = True
+        koji_session.listRPMs(buildID=build_info['id'])
+        koji_session.listArchives(buildID=build_info['id'])
+        rpms, archives = [result[0] for result in koji_session.multiCall(strict=True)]
+
     # There's no API for this, so it's better to just call the CLI directly
     cmd = ['koji', '--profile', config.koji_profile, 'download-build', str(build_info['id'])]
 
-    # Because builds may contain artifacts of different types (e.g. RPMs as well as JARs),
-    # cycle through all types of artifacts: RPMs (default), Maven archives (--type maven),
-    # and container images (--type image); purposefully ignoring Windows builds for now (--type
-    # win).
-    build_type_opts = ([], ['--type', 'maven'], ['--type', 'image'])
+    # Because builds may contain artifacts of different types (e.g. RPMs as well as JARs), download
+    # each type the build has: RPMs (default), Maven archives (--type maven), and container images
+    # (--type image); purposefully ignoring Windows builds for now (--type win). Only run the CLI
+    # for the types the build has, since running it for a type without artifacts costs a whole
+    # process and several calls just to report there is nothing.
+    archive_btypes = {archive.get('btype') for archive in archives}
+
+    build_type_opts = []
+    # The CLI downloads the artifacts one after another, so download the RPMs of each arch with a
+    # separate command to download them concurrently
+    for arch in sorted({rpm['arch'] for rpm in rpms}):
+        build_type_opts.append(['--arch', arch])
+    for btype in ('maven', 'image'):
+        if btype in archive_btypes:
+            build_type_opts.append(['--type', btype])
+
+    if not build_type_opts:
+        log.info(f'Build {build_info["id"]} has no artifacts to download')
+        return []
 
     log.info(f'Downloading build {build_info["id"]} from Koji')
-    download_prefix = 'Downloading: '
-    artifacts = []
-
-    for build_type in build_type_opts:
-        download_cmd = cmd + build_type
-        p = subprocess.Popen(download_cmd, cwd=output_dir, stdout=subprocess.PIPE)
-
-        # For some reason, any errors are streamed to stdout and not stderr
-        output, _ = p.communicate()
-        output = output.decode('utf-8')
-        if p.returncode != 0:
-            if 'No' in output and 'available' in output:
-                continue
-            raise RuntimeError(f'The command "{" ".join(cmd)}" failed with: {output}')
-
-        for line in output.strip().split('\n'):
-            if line.startswith(download_prefix):
-                file_path = os.path.join(output_dir, line.split(download_prefix)[-1].lstrip('/'))
-                artifacts.append(file_path)
-                log.info(f'Downloaded {os.path.split(file_path)[-1]}')
-
-    return artifacts
+    # Run the downloads concurrently, at most MAX_CONCURRENT_DOWNLOADS at a time. The artifacts are
+    # still returned in the order of the options above.
+    max_workers = min(len(build_type_opts), MAX_CONCURRENT_DOWNLOADS)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            functools.partial(_download_build_artifacts, output_dir=output_dir),
+            [cmd + build_type for build_type in build_type_opts])
+        return list(itertools.chain.from_iterable(results))
 
 
 def get_source_of_build(build_info):
@@ -257,15 +441,18 @@ def get_source_of_build(build_info):
         raise BuildSourceNotFound(no_source_msg)
 
     for value in task_request:
+        # The task request is deserialized from XML-RPC, so its values are plain built-in types
+        value_type = type(value)
         # Check if the value in the task_request is a git URL
-        if isinstance(value, str) and re.match(r'git\+?(http[s]?|ssh)?://', value):
-            return value
+        if value_type is str:
+            if value.startswith(GIT_URL_PREFIXES):
+                return value
         # Look for a dictionary in the task_request that may include certain keys that hold the URL
-        elif isinstance(value, dict):
-            if isinstance(value.get('ksurl'), str):
-                return value['ksurl']
-            elif isinstance(value.get('indirection_template_url'), str):
-                return value['indirection_template_url']
+        elif value_type is dict:
+            for key in ('ksurl', 'indirection_template_url'):
+                url = value.get(key)
+                if type(url) is str:
+                    return url
 
     raise BuildSourceNotFound(no_source_msg)
 
@@ -282,7 +469,9 @@ def parse_source_url(url):
 
     # Certain URLs specified in the build's Source field do not use a correct combination of
     # protocols that Git understands.
-    scheme = re.sub(r'^git\+http', r'http', url.scheme)
+    scheme = url.scheme
+    if scheme.startswith('git+http'):
+        scheme = scheme[len('git+'):]
 
     # Custom heuristics to make a URL valid
     path = url.path
@@ -316,22 +505,15 @@ def download_source(build_info, output_dir, sources_cmd=None):
     url, commit_id = parse_source_url(build_info['source'])
     log.info(f'Cloning source for {build_info["id"]}')
 
-    cmd = ['git', 'clone', url, output_dir]
-    process = subprocess.Popen(cmd,
-                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
-
-    _, error_output = process.communicate()
-    error_output = error_output.decode('utf-8')
-    if process.returncode != 0:
+    # Don't check out the default branch since the working tree is replaced by the reset below
+    cmd = ['git', 'clone', '--no-checkout', url, output_dir]
+    returncode, _, error_output = _run_command(cmd, stdout=subprocess.DEVNULL)
+    if returncode != 0:
         raise RuntimeError(f'The command "{" ".join(cmd)}" failed with: {error_output}')
 
     cmd = ['git', 'reset', '--hard', commit_id]
-    process = subprocess.Popen(cmd, cwd=output_dir,
-                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
-
-    _, error_output = process.communicate()
-    error_output = error_output.decode('utf-8')
-    if process.returncode != 0:
+    returncode, _, error_output = _run_command(cmd, cwd=output_dir, stdout=subprocess.DEVNULL)
+    if returncode != 0:
         if 'Could not parse object' in error_output:
             raise BuildSourceNotFound(
                 f'Commit {commit_id} was not found in {url} in build {build_info["id"]}'
@@ -339,63 +521,110 @@ def download_source(build_info, output_dir, sources_cmd=None):
         raise RuntimeError(f'The command "{" ".join(cmd)}" failed with: {error_output}')
 
     log.info(f'Downloading sources for {build_info["id"]}')
-    process = subprocess.Popen(sources_cmd, cwd=output_dir,
-                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
-
-    _, error_output = process.communicate()
-    error_output = error_output.decode('utf-8')
-    if process.returncode != 0:
-        raise RuntimeError(f'The command "{" ".join(cmd)}" failed with: {error_output}')
+    returncode, _, error_output = _run_command(
+        sources_cmd, cwd=output_dir, stdout=subprocess.DEVNULL)
+    if returncode != 0:
+        raise RuntimeError(f'The command "{" ".join(sources_cmd)}" failed with: {error_output}')
 
 
-def _rpm_to_cpio(rpm_file):
+def unpack_rpm(rpm_file, output_dir):
     """
-    Convert an RPM file to a CPIO file.
+    Unpack the RPM file to the specified directory.
 
-    :path str rpm_file: the path to the RPM file to convert
-    :return: the bytes of the CPIO file
-    :rtype: bytes
+    :param str rpm_file: the path to the RPM to unpack
+    :param str output_dir: the path to unpack the RPM to
+    :raises RuntimeError: if converting the RPM to a CPIO archive or unpacking it failed
     """
-    # Convert the RPM to a CPIO file
-    rpm2cpio_cmd = ['rpm2cpio', rpm_file]
-    rpm2cpio = subprocess.Popen(rpm2cpio_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    cpio_file, errors = rpm2cpio.communicate()
-    if rpm2cpio.returncode != 0:
-        raise RuntimeError(
-            f'The command "{" ".join(rpm2cpio_cmd)}" failed with: {errors.decode("utf-8")}')
-    return cpio_file
+    if libarchive is not None:
+        _unpack_rpm_in_process(rpm_file, output_dir)
+    else:
+        _unpack_rpm_with_cpio(rpm_file, output_dir)
 
+    log.info(f'Successfully unpacked {os.path.basename(rpm_file)} to {output_dir}')
 
-def _unpack_cpio(cpio_file, output_dir):
-    """
-    Unpack CPIO file bytes.
 
-    :param bytes cpio_file: the CPIO file to unpack
+def _unpack_rpm_in_process(rpm_file, output_dir):
     """
-    cpio_cmd = ['cpio', '-idmv']
-    cpio = subprocess.Popen(
-        cpio_cmd, cwd=output_dir, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
-    _, errors = cpio.communicate(input=cpio_file)
-    if cpio.returncode != 0:
-        raise RuntimeError(
-            f'The command "{" ".join(cpio_cmd)}" failed with: {errors.decode("utf-8")}')
-
+    Unpack the RPM file to the specified directory with libarchive, without forking any processes.
 
-def unpack_rpm(rpm_file, output_dir):
+    :param str rpm_file: the path to the RPM to unpack
+    :param str output_dir: the path to unpack the RPM to
+    :raises RuntimeError: if reading the RPM or unpacking it failed
     """
-    Unpack the RPM file to the specified directory.
+    # libarchive extracts relative to the current directory, which can't be changed here since RPMs
+    # are unpacked concurrently, so every path (and hard link) is rebased onto output_dir instead.
+    # Resolve output_dir once, so that the rebased paths contain no ".." or symbolic links that the
+    # secure extraction flags below would reject.
+    output_dir = os.path.realpath(output_dir)
+    # The directories that would be unpacked without write permissions for the owner
+    read_only_dirs = []
+
+    def _rebased_entries(archive):
+        for entry in archive:
+            # Strip the leading slash of absolute paths so that they can't escape output_dir
+            entry.pathname = os.path.join(output_dir, entry.pathname.lstrip('/'))
+            if entry.islnk:
+                entry.linkpath = os.path.join(output_dir, entry.linkpath.lstrip('/'))
+            if entry.isdir and entry.mode & stat.S_IRWXU != stat.S_IRWXU:
+                read_only_dirs.append(entry.pathname)
+            yield entry
+
+    # Restore the modification times but not the owners. Since the rebased paths are absolute,
+    # EXTRACT_SECURE_NOABSOLUTEPATHS can't be used, but the paths were confined to output_dir above,
+    # and entries can't escape it with ".." or through the symbolic links they create.
+    flags = (libarchive.extract.EXTRACT_TIME | libarchive.extract.EXTRACT_SECURE_NODOTDOT
+             | libarchive.extract.EXTRACT_SECURE_SYMLINKS)
+    try:
+        with libarchive.file_reader(rpm_file) as archive:
+            libarchive.extract.extract_entries(_rebased_entries(archive), flags)
+    except libarchive.ArchiveError as error:
+        raise RuntimeError(f'Unpacking {rpm_file} failed with: {error}')
+
+    # libarchive still applies the mode of each entry (minus the umask), so give the owner full
+    # access to the directories that are read-only in the RPM (e.g. 0555), which would otherwise
+    # prevent anything from being written to or removed from them later on
+    for dir_path in read_only_dirs:
+        os.chmod(dir_path, stat.S_IMODE(os.lstat(dir_path).st_mode) | stat.S_IRWXU)
+
+
+def _unpack_rpm_with_cpio(rpm_file, output_dir):
+    """
+    Unpack the RPM file to the specified directory by piping rpm2cpio into cpio.
 
     :param str rpm_file: the path to the RPM to unpack
     :param str output_dir: the path to unpack the RPM to
+    :raises RuntimeError: if converting the RPM to a CPIO archive or unpacking it failed
     """
     assert_command('rpm2cpio')
     assert_command('cpio')
 
-    # Get the CPIO file
-    cpio_file = _rpm_to_cpio(rpm_file)
-    # Unpack the CPIO file
-    _unpack_cpio(cpio_file, output_dir)
-    log.info(f'Successfully unpacked {os.path.split(rpm_file)[-1]} to {output_dir}')
+    rpm2cpio_cmd = ['rpm2cpio', rpm_file]
+    # Don't list the unpacked files (-v) since the output isn't used
+    cpio_cmd = ['cpio', '-idm']
+    with tempfile.TemporaryFile() as rpm2cpio_errors, tempfile.TemporaryFile() as cpio_errors:
+        # Pipe the CPIO archive from rpm2cpio directly to cpio, so that both run at the same time
+        # and the archive never has to be held in memory
+        rpm2cpio = subprocess.Popen(rpm2cpio_cmd, stdout=subprocess.PIPE, stderr=rpm2cpio_errors)
+        cpio = subprocess.Popen(
+            cpio_cmd, cwd=output_dir, stdin=rpm2cpio.stdout, stderr=cpio_errors)
+        # Enlarge the pipe so that both commands can move more data per context switch. This is
+        # just an optimization, so ignore the failure if the OS doesn't support or allow it.
+        try:
+            fcntl.fcntl(rpm2cpio.stdout.fileno(), F_SETPIPE_SZ, RPM_PIPE_SIZE)
+        except OSError:
+            log.debug('Failed to increase the size of the pipe between rpm2cpio and cpio')
+        # Close the parent's copy of the pipe so that rpm2cpio gets a SIGPIPE if cpio exits early
+        rpm2cpio.stdout.close()
+        cpio.wait()
+        rpm2cpio.wait()
+
+        # If rpm2cpio was killed by SIGPIPE, then cpio stopped reading and will report why
+        if rpm2cpio.returncode not in (0, -signal.SIGPIPE):
+            raise RuntimeError(f'The command "{" ".join(rpm2cpio_cmd)}" failed with: '
+                               f'{_read_error_output(rpm2cpio_errors)}')
+        if cpio.returncode != 0:
+            raise RuntimeError(f'The command "{" ".join(cpio_cmd)}" failed with: '
+                               f'{_read_error_output(cpio_errors)}')
 
 
 def unpack_container_image(container_image_file, output_dir):
@@ -405,21 +634,33 @@ def unpack_container_image(container_image_file, output_dir):
     :param str container_image_file: the path to the container image file to unpack
     :param str output_dir: the path to unpack the container image to
     """
-    # Unpack the manifest.json file from which we figure out the latest image layer
-    with tarfile.open(container_image_file) as tar:
-        manifest_file = tar.extractfile('manifest.json')
-        manifest_data = json.loads(manifest_file.read().decode('utf-8'))
-        layer_to_unpack = manifest_data[0]['Layers'][-1]
-
-        # Unpack the last layer, which itself is a .tar file
-        tar.extract(layer_to_unpack)
-
-    # Extract the file system contents from the last layer
-    with tarfile.open(layer_to_unpack) as tar:
-        tar.extractall(output_dir)
-
-    # Remove extracted layer .tar file
-    shutil.rmtree(os.path.split(layer_to_unpack)[0])
+    # The image is read as a stream in both passes below, so that tarfile doesn't have to index
+    # every member of the compressed image up front just to look up a single file by name.
+    # Read the manifest.json file from which we figure out the latest image layer
+    layer_to_unpack = None
+    with tarfile.open(container_image_file, mode='r|*', bufsize=TAR_STREAM_BUFSIZE) as tar:
+        for member in tar:
+            if member.name == 'manifest.json':
+                manifest_data = json.loads(tar.extractfile(member).read().decode('utf-8'))
+                layer_to_unpack = manifest_data[0]['Layers'][-1]
+                break
+
+    if layer_to_unpack is None:
+        raise RuntimeError(f'The container image "{container_image_file}" has no manifest.json')
+
+    # Extract the file system contents from the last layer, which itself is a .tar file, directly
+    # from the container image without writing the layer to disk first
+    with tarfile.open(container_image_file, mode='r|*', bufsize=TAR_STREAM_BUFSIZE) as tar:
+        for member in tar:
+            if member.name == layer_to_unpack:
+                with tarfile.open(fileobj=tar.extractfile(member), mode='r|*',
+                                  bufsize=TAR_STREAM_BUFSIZE) as layer:
+                    layer.extractall(output_dir)
+                break
+        else:
+            raise RuntimeError(
+                f'The layer "{layer_to_unpack}" is not in the container image '
+                f'"{container_image_file}"')
 
     log.info(f'Successfully unpacked {container_image_file} to {output_dir}')
 
@@ -450,6 +691,70 @@ def unpack_tar(tar_file, output_dir):  # pragma: no cover
     log.info(f'Successfully unpacked {tar_file} to {output_dir}')
 
 
+def _get_existing_files(paths):
+    """
+    Get the paths that point to existing files.
+
+    Each parent directory is listed once instead of calling stat on every path, since builds
+    usually have many artifacts downloaded to the same directory.
+
+    :param list paths: the paths to check
+    :return: the paths that point to existing files
+    :rtype: set
+    """
+    paths_by_dir = {}
+    for path in paths:
+        paths_by_dir.setdefault(os.path.dirname(path), {})[os.path.basename(path)] = path
+
+    existing_files = set()
+    for dir_name, paths_by_name in paths_by_dir.items():
+        try:
+            # An empty directory name means the path is relative to the current directory
+            with os.scandir(dir_name or '.') as entries:
+                for entry in entries:
+                    if entry.name in paths_by_name and entry.is_file():
+                        existing_files.add(paths_by_name[entry.name])
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+
+    return existing_files
+
+
+def _get_extension(filename):
+    """
+    Get the extension of a file name, including the ".tar" of compressed TAR archives.
+
+    :param str filename: the file name to get the extension of
+    :return: the extension, such as ".rpm" or ".tar.gz", or an empty string if there is none
+    :rtype: str
+    """
+    stem, dot, extension = filename.rpartition('.')
+    if not dot:
+        return ''
+    if stem.endswith('.tar'):
+        return '.tar.' + extension
+    return '.' + extension
+
+
+def _unpack_archive_or_skip(unpack_archive, archive, output_dir):
+    """
+    Unpack a ZIP-like or TAR-like archive, skipping it if it turns out to be invalid.
+
+    The type of these archives is usually determined by their extension alone, so a truncated or
+    mislabelled archive is only detected when it's unpacked.
+
+    :param function unpack_archive: the function to unpack the archive with
+    :param str archive: the path to the archive file to unpack
+    :param str output_dir: the path to unpack the archive to
+    """
+    try:
+        unpack_archive(archive, output_dir)
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError) as error:
+        log.warning(f'Skipping unpacking (invalid archive): {archive}: {error}')
+        # Don't leave anything behind that would look like the archive's contents
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
 def unpack_artifacts(artifacts, output_dir):
     """
     Unpack a list of artifacts to the specified directory.
@@ -460,35 +765,60 @@ def unpack_artifacts(artifacts, output_dir):
     if output_dir and not os.path.isdir(output_dir):
         raise RuntimeError(f'The passed in directory of "{output_dir}" does not exist')
 
-    for artifact in artifacts:
-        if not os.path.isfile(artifact):
-            raise RuntimeError(f'The artifact "{artifact}" could not be found')
-
-        artifact_filename = os.path.split(artifact)[-1]
-        log.info(f'Unpacking {artifact_filename}')
-
-        if artifact_filename.startswith('docker-image') and artifact_filename.endswith('.tar.gz'):
-            output_subdir = os.path.join(output_dir, 'container_layer', artifact_filename)
-            os.makedirs(output_subdir)
-            unpack_container_image(artifact, output_subdir)
-
-        elif artifact_filename.endswith('.rpm'):
-            output_subdir = os.path.join(output_dir, 'rpm', artifact_filename)
-            os.makedirs(output_subdir)
-            unpack_rpm(artifact, output_subdir)
-
-        elif zipfile.is_zipfile(artifact):
-            output_subdir = os.path.join(output_dir, 'non-rpm', artifact_filename)
+    # Only join the paths once since there can be thousands of artifacts to go through
+    container_layer_dir = os.path.join(output_dir, 'container_layer') + os.sep
+    rpm_dir = os.path.join(output_dir, 'rpm') + os.sep
+    non_rpm_dir = os.path.join(output_dir, 'non-rpm') + os.sep
+    # The directory to unpack each type of archive to and the function to unpack it with
+    unpackers = {
+        'rpm': (rpm_dir, unpack_rpm),
+        'zip': (non_rpm_dir, unpack_zip),
+        'tar': (non_rpm_dir, unpack_tar),
+    }
+
+    existing_artifacts = _get_existing_files(artifacts)
+    # The artifacts are independent of each other, so unpack them concurrently. Threads are enough
+    # since RPMs, which make up most of the artifacts, are unpacked either by external commands or
+    # by libarchive, whose C functions are called through ctypes, which releases the GIL.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = []
+        for artifact in artifacts:
+            if artifact not in existing_artifacts:
+                raise RuntimeError(f'The artifact "{artifact}" could not be found')
+
+            artifact_filename = artifact.rpartition(os.sep)[2]
+            log.info(f'Unpacking {artifact_filename}')
+
+            if (artifact_filename.startswith('docker-image')
+                    and artifact_filename.endswith('.tar.gz')):
+                output_subdir = container_layer_dir + artifact_filename
+                unpack_archive = unpack_container_image
+            else:
+                archive_type = ARCHIVE_TYPES_BY_EXTENSION.get(_get_extension(artifact_filename))
+                if archive_type is None:
+                    # Only inspect the file's contents when the extension doesn't give away the
+                    # archive type
+                    if zipfile.is_zipfile(artifact):
+                        archive_type = 'zip'
+                    elif tarfile.is_tarfile(artifact):
+                        archive_type = 'tar'
+                    else:
+                        # Files such as .pom do not need to be unpacked, others such as .gem are
+                        # not yet supported.
+                        log.info('Skipping unpacking (unsupported archive type or not an archive): '
+                                 f'{artifact}')
+                        continue
+
+                archive_dir, unpack_archive = unpackers[archive_type]
+                output_subdir = archive_dir + artifact_filename
+                if archive_type != 'rpm':
+                    unpack_archive = functools.partial(_unpack_archive_or_skip, unpack_archive)
+
+            # Create the directories here rather than in the worker threads so that the parent
+            # directories aren't created concurrently
             os.makedirs(output_subdir)
-            unpack_zip(artifact, output_subdir)
+            futures.append(executor.submit(unpack_archive, artifact, output_subdir))
 
-        elif tarfile.is_tarfile(artifact):
-            output_subdir = os.path.join(output_dir, 'non-rpm', artifact_filename)
-            os.makedirs(output_subdir)
-            unpack_tar(artifact, output_subdir)
-
-        else:
-            # Files such as .pom do not need to be unpacked, others such as .gem are not yet
-            # supported.
-            log.info(f'Skipping unpacking (unsupported archive type or not an archive): {artifact}')
-            continue
+        # Raise the first error encountered while unpacking
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
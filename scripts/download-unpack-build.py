@@ -18,6 +18,7 @@ log.setLevel(logging.INFO)
 # Make the log statements look like print statements on the root log handler
 logging.getLogger().handlers[0].setFormatter(logging.Formatter('%(message)s'))
 
+
 parser = argparse.ArgumentParser(
     description='Download the artifacts associated with a build and unpack them')
 parser.add_argument('build_identifier', type=str, help=('The Koji build identifer (ID or NVR)'))
@@ -39,11 +40,10 @@ output_source_dir = os.path.join(output_dir, Analyzer.SOURCE_DIR)
 unpacked_archives_dir = os.path.join(output_dir, Analyzer.UNPACKED_ARCHIVES_DIR)
 
 for directory in (output_metadata_dir, output_files_dir, unpacked_archives_dir, output_source_dir):
-    if not os.path.isdir(directory):
-        os.mkdir(directory)
+    os.makedirs(directory, exist_ok=True)
 
 try:
-    build_info = utils.download_build_data(build_identifier, output_metadata_dir)
+    build_info, rpms, archives = utils.download_build_data(build_identifier, output_metadata_dir)
 except (BuildSourceNotFound, BuildInvalidState, BuildTypeNotFound) as exc:
     print(exc, file=sys.stderr)
     # If the build's source or type was not found, or the build is not in a valid state,
@@ -56,7 +56,8 @@ except BuildTypeNotSupported as exc:
     # unnecessary data. Exit with 0 so that minimal analysis (creating a Build node) continues.
     sys.exit(0)
 
-artifacts = utils.download_build(build_info, output_files_dir)
+# Reuse the lists of RPMs and archives that download_build_data already got from Koji
+artifacts = utils.download_build(build_info, output_files_dir, rpms=rpms, archives=archives)
 utils.download_source(build_info, output_source_dir)
 utils.unpack_artifacts(artifacts, unpacked_archives_dir)
 
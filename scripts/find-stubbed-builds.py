@@ -5,7 +5,6 @@ import argparse
 
 from neomodel import db
 
-from assayist.common.models.content import Build
 from assayist.processor.configuration import config
 from assayist.processor.base import Analyzer
 
@@ -13,8 +12,14 @@ parser = argparse.ArgumentParser(description='Return a list of stubbed builds')
 args = parser.parse_args()
 
 db.set_connection(config.DATABASE_URL)
-stubbed_builds = Build.nodes.has(source_location=False).filter(
-    type___in=Analyzer.SUPPORTED_BUILD_TYPES)
+# Only the build IDs are needed, so query for them directly instead of having neomodel inflate
+# every stubbed Build node
+query = """
+    MATCH (build:Build)
+    WHERE build.type IN $types AND NOT (build)-[:BUILT_FROM]->(:SourceLocation)
+    RETURN build.id
+"""
+results, _ = db.cypher_query(query, {'types': list(Analyzer.SUPPORTED_BUILD_TYPES)})
 
-for build in stubbed_builds:
-    print(build.id_)
+for (build_id,) in results:
+    print(build_id)
@@ -2,14 +2,9 @@
 # SPDX-License-Identifier: GPL-3.0+
 
 import argparse
+import importlib
 import sys
 
-from assayist.processor.container_analyzer import ContainerAnalyzer
-from assayist.processor.container_go_analyzer import ContainerGoAnalyzer
-from assayist.processor.container_rpm_analyzer import ContainerRPMAnalyzer
-from assayist.processor.loose_artifact_analyzer import LooseArtifactAnalyzer
-from assayist.processor.main_analyzer import MainAnalyzer
-from assayist.processor.post_analyzer import PostAnalyzer
 from assayist.processor.error import AnalysisFailure
 
 
@@ -20,17 +15,26 @@ args = parser.parse_args()
 
 input_dir = args.input_dir or '.'
 
-analyzers = [MainAnalyzer, ContainerAnalyzer, ContainerRPMAnalyzer, ContainerGoAnalyzer,
-             LooseArtifactAnalyzer, PostAnalyzer]
+# The analyzers to run, in order, and their modules. Each module is only imported right before its
+# analyzer runs, so that a failure of MainAnalyzer doesn't pay for loading the others.
+analyzer_modules = {
+    'MainAnalyzer': 'assayist.processor.main_analyzer',
+    'ContainerAnalyzer': 'assayist.processor.container_analyzer',
+    'ContainerRPMAnalyzer': 'assayist.processor.container_rpm_analyzer',
+    'ContainerGoAnalyzer': 'assayist.processor.container_go_analyzer',
+    'LooseArtifactAnalyzer': 'assayist.processor.loose_artifact_analyzer',
+    'PostAnalyzer': 'assayist.processor.post_analyzer',
+}
 analyzer_failures = []
 
-for analyzer in analyzers:
-    print(f'Running {analyzer.__name__}...')
+for analyzer_name, module_name in analyzer_modules.items():
+    print(f'Running {analyzer_name}...')
+    analyzer = getattr(importlib.import_module(module_name), analyzer_name)
     try:
         analyzer(input_dir).main()
     except AnalysisFailure as error:
         # Don't continue if the main analyzer failed since other analyzers rely on it
-        if analyzer == MainAnalyzer:
+        if analyzer_name == 'MainAnalyzer':
             print('MainAnalyzer failed with the following:\n{}'.format(error),
                   file=sys.stderr)
             sys.exit(3)
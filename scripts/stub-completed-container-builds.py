@@ -58,7 +58,18 @@ args = parser.parse_args()
 
 db.set_connection(config.DATABASE_URL)
 koji = get_koji_session()
+# Key the builds by their ID since a build created right at the boundary of two batches could be
+# returned by both of them
+build_ids = set()
 for start, end in batch_dates_for_range(args.start, args.end):
-    print(f'Stubbing container builds between {start} and {end}.')
+    print(f'Finding container builds between {start} and {end}.')
     for build in koji.listBuilds(createdAfter=start, createdBefore=end, type='image', state=1):
-        Build.get_or_create({'id_': build['build_id'], 'type_': 'buildContainer'})
+        build_ids.add(build['build_id'])
+
+print(f'Stubbing {len(build_ids)} container builds.')
+if build_ids:
+    # Create all the builds in a single query instead of one query per build. The created nodes
+    # aren't used, so don't have neomodel inflate them.
+    Build.get_or_create(
+        *({'id_': build_id, 'type_': 'buildContainer'} for build_id in sorted(build_ids)),
+        lazy=True)
@@ -21,7 +21,9 @@ def test_set_component_names_new():
 
 def test_set_component_names_add_alt_names():
     """Test that set_component_names can add alternative names to an existing component."""
-    Component.get_or_create_singleton('', 'requests', 'pypi')
+    # The graph is empty, so create the component directly instead of going through
+    # get_or_create_singleton, which first has to look for a match
+    Component(canonical_namespace='', canonical_name='requests', canonical_type='pypi').save()
 
     modify.set_component_names('requests', 'pypi', alternatives=['python-requests'])
 
@@ -33,9 +35,8 @@ def test_set_component_names_add_alt_names():
 
 def test_set_component_names_fix_canonical_name():
     """Test that set_component_names fixes a canonical name."""
-    c = Component.get_or_create_singleton('', 'python-requests', 'pypi')
-    c.alternative_names = ['python3-requests']
-    c.save()
+    Component(canonical_namespace='', canonical_name='python-requests', canonical_type='pypi',
+              alternative_names=['python3-requests']).save()
 
     modify.set_component_names('requests', 'pypi', alternatives=['python-requests'])
 
@@ -48,9 +49,8 @@ def test_set_component_names_fix_canonical_name():
 
 def test_set_component_names_fix_canonical_name_no_alt_input():
     """Test that set_component_names fixes a canonical name with alternatives input."""
-    c = Component.get_or_create_singleton('', 'python-requests', 'pypi')
-    c.alternative_names = ['requests']
-    c.save()
+    Component(canonical_namespace='', canonical_name='python-requests', canonical_type='pypi',
+              alternative_names=['requests']).save()
 
     modify.set_component_names('requests', 'pypi')
 
@@ -63,15 +63,13 @@ def test_set_component_names_fix_canonical_name_no_alt_input():
 
 def test_set_component_names_merge_multiple_components():
     """Test that set_component_names merges all the matching components."""
-    c1 = Component.get_or_create_singleton('', 'python-requests', 'pypi')
-    c1.alternative_names = ['py-requests', 'requests']
-    c1.save()
+    c1 = Component(canonical_namespace='', canonical_name='python-requests', canonical_type='pypi',
+                   alternative_names=['py-requests', 'requests']).save()
     sl1 = SourceLocation(url='http://domain.local/python-requests', type_='local').save()
     c1.source_locations.connect(sl1)
 
-    c2 = Component.get_or_create_singleton('', 'python2-requests', 'pypi')
-    c2.alternative_names = ['python3-requests', 'requests']
-    c2.save()
+    c2 = Component(canonical_namespace='', canonical_name='python2-requests', canonical_type='pypi',
+                   alternative_names=['python3-requests', 'requests']).save()
     sl2 = SourceLocation(url='http://domain.local/python2-requests', type_='local').save()
     c2.source_locations.connect(sl2)
     sl3 = SourceLocation(url='http://domain.local/requests', type_='local').save()
@@ -87,8 +85,8 @@ def test_set_component_names_merge_multiple_components():
         'py-requests', 'python2-requests', 'python3-requests', 'python-requests'])
     assert len(component.source_locations) == 3
 
-    assert Component.nodes.get_or_none(canonical_name='python-requests') is None
-    assert Component.nodes.get_or_none(canonical_name='python2-requests') is None
+    assert not Component.nodes.filter(canonical_name='python-requests')
+    assert not Component.nodes.filter(canonical_name='python2-requests')
 
 
 @pytest.mark.parametrize('args,kwargs', [
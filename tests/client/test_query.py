@@ -2,6 +2,8 @@
 
 from collections.abc import Mapping, Collection
 
+from neomodel import db
+
 from assayist.client import query
 from assayist.common.models.source import SourceLocation, Component
 from tests.factories import UseCaseFactory
@@ -9,7 +11,8 @@ from tests.factories import UseCaseFactory
 
 def test_get_container_by_component():
     """Test the get_container_by_component function with a container that includes a component."""
-    expected_build_id, _, _ = UseCaseFactory.container_with_rpm_artifacts()
+    with db.transaction:
+        expected_build_id, _, _ = UseCaseFactory.container_with_rpm_artifacts()
 
     rv = query.get_container_by_component('yum-utils', 'generic', '1.1.31')
     assert rv == {int(expected_build_id)}
@@ -17,7 +20,8 @@ def test_get_container_by_component():
 
 def test_get_container_with_maven_artifacts():
     """Test the get_container_by_component function with a container that embeds Maven artifacts."""
-    expected_build_id = UseCaseFactory.container_with_maven_artifacts()
+    with db.transaction:
+        expected_build_id = UseCaseFactory.container_with_maven_artifacts()
 
     rv = query.get_container_by_component('com.redhat.lightblue.client:lightblue-client-core',
                                           'maven', '10.0.1')
@@ -26,7 +30,8 @@ def test_get_container_with_maven_artifacts():
 
 def test_get_container_by_embedded_component():
     """Test the get_container_by_component function with a container that embeds a component."""
-    parent_build_id, build_id = UseCaseFactory.container_with_go_and_rpm_artifacts()
+    with db.transaction:
+        parent_build_id, build_id = UseCaseFactory.container_with_go_and_rpm_artifacts()
 
     assert query.get_container_by_component('fsnotify.v1', 'golang', 'v1.4.7') == {build_id}
     assert query.get_container_by_component('sys', 'golang',
@@ -38,7 +43,9 @@ def test_get_container_by_embedded_component():
 
 def test_get_container_sources():
     """Test the get_container_sources function."""
-    container_build_id, internal_urls, upstream_urls = UseCaseFactory.container_with_rpm_artifacts()
+    with db.transaction:
+        container_build_id, internal_urls, upstream_urls = \
+            UseCaseFactory.container_with_rpm_artifacts()
     expected = {
         'internal_urls': internal_urls[0:2],
         'upstream_urls': upstream_urls[0:2],
@@ -65,7 +72,8 @@ def test_get_source_components_for_build():
     #       <-- (:Build) <-- (bash_internal_source:SourceLocation)
     #       <-- (bash_upstream_source:SourceLocation) <-- (:Component)
 
-    _, build_id = UseCaseFactory.container_with_go_and_rpm_artifacts()
+    with db.transaction:
+        _, build_id = UseCaseFactory.container_with_go_and_rpm_artifacts()
     result = query.get_source_components_for_build(build_id)
 
     def check_artifact_keys(d):
@@ -180,19 +188,20 @@ def test_get_source_components_for_build():
 
 def test_get_current_and_previous_versions():
     """Test the get_current_and_previous_versions function."""
-    go = Component(
-        canonical_name='golang', canonical_type='generic', canonical_namespace='redhat').save()
-    next_sl = None
     url = 'git://pkgs.domain.local/rpms/golang?#fed96461b05c0078e537c93a3fe974e8b334{version}'
-    for version in ('1.9.7', '1.9.6', '1.9.5', '1.9.4', '1.9.3'):
-        sl = SourceLocation(
-            url=url.format(version=version.replace('.', '')),
-            canonical_version=version,
-            type_='local').save()
-        sl.component.connect(go)
-        if next_sl:
-            next_sl.previous_version.connect(sl)
-        next_sl = sl
+    with db.transaction:
+        go = Component(
+            canonical_name='golang', canonical_type='generic', canonical_namespace='redhat').save()
+        next_sl = None
+        for version in ('1.9.7', '1.9.6', '1.9.5', '1.9.4', '1.9.3'):
+            sl = SourceLocation(
+                url=url.format(version=version.replace('.', '')),
+                canonical_version=version,
+                type_='local').save()
+            sl.component.connect(go)
+            if next_sl:
+                next_sl.previous_version.connect(sl)
+            next_sl = sl
 
     rv = query.get_current_and_previous_versions('golang', 'generic', '1.9.6')
     versions = set([result['canonical_version'] for result in rv])
@@ -216,21 +225,23 @@ def test_get_container_built_with_artifact():
     The input to the API will be two internal source locations, each representing a different
     version of "python-devel".
     """
-    traditional_cb_id, internal_sls, _ = UseCaseFactory.container_with_rpm_artifacts()
-    python_devel_sl_url = internal_sls[2]
-    _, _, _, multi_stage_builder = UseCaseFactory._container_build(
-        'python-builder-container')
-    _, _, app_container_build, app_container = UseCaseFactory._container_build(
-        'app-xyz-container')
-    _, python_devel_rpm, _, _, python_devel_sl2 = UseCaseFactory._rpm_build(
-        'python-devel', '3.5.4')
-    multi_stage_builder.embedded_artifacts.connect(python_devel_rpm)
-    app_container.buildroot_artifacts.connect(multi_stage_builder)
-    # This RPM doesn't affect the query, but it makes it so the "app-xyz" container at least has
-    # some content to simulate the real world
-    _, requests_rpm, _, _, _ = UseCaseFactory._rpm_build(
-        'requests', '2.20.1', 'https://github.com/requests/requests/releases/tag/v2.20.1')
-    app_container.embedded_artifacts.connect(requests_rpm)
+    # Build the whole graph in a single transaction so it's committed once
+    with db.transaction:
+        traditional_cb_id, internal_sls, _ = UseCaseFactory.container_with_rpm_artifacts()
+        python_devel_sl_url = internal_sls[2]
+        _, _, _, multi_stage_builder = UseCaseFactory._container_build(
+            'python-builder-container')
+        _, _, app_container_build, app_container = UseCaseFactory._container_build(
+            'app-xyz-container')
+        _, python_devel_rpm, _, _, python_devel_sl2 = UseCaseFactory._rpm_build(
+            'python-devel', '3.5.4')
+        multi_stage_builder.embedded_artifacts.connect(python_devel_rpm)
+        app_container.buildroot_artifacts.connect(multi_stage_builder)
+        # This RPM doesn't affect the query, but it makes it so the "app-xyz" container at least has
+        # some content to simulate the real world
+        _, requests_rpm, _, _, _ = UseCaseFactory._rpm_build(
+            'requests', '2.20.1', 'https://github.com/requests/requests/releases/tag/v2.20.1')
+        app_container.embedded_artifacts.connect(requests_rpm)
 
     api_input = [
         {'url': python_devel_sl_url},
@@ -1,11 +1,15 @@
 # SPDX-License-Identifier: GPL-3.0+
 
+import concurrent.futures
+import io
 import json
 import os
 import pathlib
 import shutil
+import signal
 import subprocess
 import tarfile
+import zipfile
 
 import koji
 import mock
@@ -20,13 +24,18 @@ from assayist.processor.error import (
 
 def test_assert_command():
     """Test the assert_command function when the command exists."""
+    utils._which.cache_clear()
     with mock.patch('shutil.which', return_value=True) as mock_which:
         assert utils.assert_command('bash') is None
         mock_which.assert_called_once_with('bash')
+        # The result is cached, so a second lookup shouldn't search $PATH again
+        assert utils.assert_command('bash') is None
+        mock_which.assert_called_once_with('bash')
 
 
 def test_assert_command_not_found():
     """Test the assert_command function when the command doesn't exist."""
+    utils._which.cache_clear()
     with mock.patch('shutil.which', return_value=False) as mock_which:
         with pytest.raises(RuntimeError) as e:
             assert utils.assert_command('bash') is None
@@ -34,6 +43,27 @@ def test_assert_command_not_found():
         mock_which.assert_called_once_with('bash')
 
 
+def test_run_command():
+    """Test the _run_command function with a successful command."""
+    assert utils._run_command(['echo', 'hello'], stdout=subprocess.PIPE) == (0, b'hello\n', '')
+
+
+@mock.patch('assayist.processor.utils.ERROR_OUTPUT_LIMIT', new=5)
+def test_run_command_failed():
+    """Test that _run_command only returns the tail of the error output of a failed command."""
+    rv = utils._run_command(['sh', '-c', 'echo "some error" >&2; exit 2'])
+    assert rv == (2, None, 'rror\n')
+
+
+def test_write_file(tmpdir):
+    """Test that write_file writes JSON that can be read back, including integer keys."""
+    data = {1: [{'id': 1, 'name': 'bash'}], 2: []}
+    utils.write_file(data, str(tmpdir), Analyzer.IMAGE_RPM_FILE)
+
+    with open(tmpdir.join(Analyzer.IMAGE_RPM_FILE), 'r') as f:
+        assert json.load(f) == {'1': [{'id': 1, 'name': 'bash'}], '2': []}
+
+
 @mock.patch('assayist.processor.utils.assert_command')
 @mock.patch('assayist.processor.utils.get_koji_session')
 @mock.patch('assayist.processor.utils.write_file')
@@ -60,10 +90,17 @@ def test_download_build_data_full_data(m_write_file, m_get_koji_session, m_asser
     m_koji.listRPMs.return_value = RPM_INFO
     m_koji.listArchives.return_value = ARCHIVE_INFO
     m_koji.getBuildrootListing.return_value = BUILDROOT_LISTING
-    m_koji.multiCall.return_value = BUILDROOT_INFO
+    # The first multicall gets the maven info and the lists of RPMs and archives, the rest get the
+    # RPMs in each of the three buildroots
+    m_koji.multiCall.side_effect = [
+        [[MAVEN_INFO], [RPM_INFO], [ARCHIVE_INFO]],
+        BUILDROOT_INFO,
+        BUILDROOT_INFO,
+        BUILDROOT_INFO,
+    ]
     m_get_koji_session.return_value = m_koji
 
-    utils.download_build_data(1, PATH)
+    assert utils.download_build_data(1, PATH) == (BUILD_INFO, RPM_INFO, ARCHIVE_INFO)
 
     # Assert that the brew calls we expect happened.
     m_koji.getBuild.assert_called_once_with(1)
@@ -125,18 +162,22 @@ def test_download_build_data_empty_data(m_write_file, m_get_koji_session, m_asse
     m_koji.listRPMs.return_value = RPM_INFO
     m_koji.listArchives.return_value = ARCHIVE_INFO
     m_koji.getBuildrootListing.return_value = None
+    m_koji.multiCall.return_value = [[None], [RPM_INFO], [ARCHIVE_INFO]]
     m_get_koji_session.return_value = m_koji
 
-    utils.download_build_data(1, PATH)
+    utils.download_build_data('some-build-1.0-1', PATH)
 
-    # Assert that the brew calls we expect happened.
-    m_koji.getBuild.assert_called_once_with(1)
+    # Assert that the brew calls we expect happened. Only the first call should look up the build
+    # by its NVR, the rest should use the build ID.
+    m_koji.getBuild.assert_called_once_with('some-build-1.0-1')
     assert m_koji.getTaskInfo.call_count == 0
     m_koji.getMavenBuild.assert_called_once_with(1)
     # One regular and one for the image
     m_koji.listRPMs.assert_called_once_with(1)
     m_koji.listArchives.assert_called_once_with(1)
     assert m_koji.getBuildrootListings.call_count == 0
+    # The maven info and the lists of RPMs and archives are fetched in a single multicall
+    m_koji.multiCall.assert_called_once_with(strict=True)
 
     # Now assert that only the data we returned was successfully written through to the files.
 
@@ -151,7 +192,7 @@ def test_download_build_data_empty_data(m_write_file, m_get_koji_session, m_asse
 @mock.patch('assayist.processor.utils.write_file')
 def test_download_build_unsupported_build_type(m_write_file, m_get_koji_session, m_assert_command):
     """Test download_build_data function for unsupported build types."""
-    BUILD_INFO = {'task_id': 123, 'id': 1, 'source': 'http://some.url', 'extra': {},
+    BUILD_INFO = {'task_id': 123, 'id': 1, 'source': None, 'extra': {},
                   'state': koji.BUILD_STATES['COMPLETE']}
     TASK_INFO = {'method': 'randomType'}  # I.e. value not present in Analyzer.SUPPORTED_BUILD_TYPES
 
@@ -163,9 +204,15 @@ def test_download_build_unsupported_build_type(m_write_file, m_get_koji_session,
     with pytest.raises(BuildTypeNotSupported):
         utils.download_build_data(1, '/some/path')
 
-    # Assert that the brew calls we expect happened.
+    # Assert that the brew calls we expect happened. The source isn't needed for unsupported
+    # builds, so it shouldn't be looked up.
     m_koji.getBuild.assert_called_once_with(1)
     m_koji.getTaskInfo.assert_called_once_with(123)
+    assert m_koji.getTaskRequest.call_count == 0
+    m_write_file.assert_has_calls([
+        mock.call(TASK_INFO, '/some/path', Analyzer.TASK_FILE),
+        mock.call(BUILD_INFO, '/some/path', Analyzer.BUILD_FILE),
+    ])
 
 
 @mock.patch('assayist.processor.utils.assert_command')
@@ -204,39 +251,56 @@ def test_download_build_invalid_state(m_get_koji_session, m_assert_command):
     m_koji.getBuild.assert_called_once_with(1)
 
 
+@mock.patch('assayist.processor.utils.get_koji_session')
 @mock.patch('assayist.processor.utils.assert_command')
 @mock.patch('subprocess.Popen')
-def test_download_build(m_popen, m_assert_command):
+def test_download_build(m_popen, m_assert_command, m_get_koji_session):
     """Test the download_build function."""
-    error = b''
+    rpms = [{'id': 1, 'arch': 'src'}, {'id': 2, 'arch': 'noarch'}]
+    archives = [{'id': 3, 'btype': 'maven'}, {'id': 4, 'btype': 'image'}]
 
-    m_process_rpm = mock.Mock()
+    m_process_noarch = mock.Mock()
     output = (b'Downloading: resultsdb-2.1.0-2.el7.noarch.rpm\n'
               b'[===========================         ]  75%  64.00 KiB\r'
-              b'[====================================] 100%  84.34 KiB\r\n'
-              b'Downloading: resultsdb-2.1.0-2.el7.src.rpm\n'
+              b'[====================================] 100%  84.34 KiB\r\n')
+    m_process_noarch.stdout = io.BytesIO(output)
+    m_process_noarch.wait.return_value = 0
+
+    m_process_src = mock.Mock()
+    output = (b'Downloading: resultsdb-2.1.0-2.el7.src.rpm\n'
               b'[============================        ]  80%  64.00 KiB\r'
               b'[====================================] 100%  79.61 KiB\r\n')
-    m_process_rpm.communicate.return_value = (output, error)
-    m_process_rpm.returncode = 0
+    m_process_src.stdout = io.BytesIO(output)
+    m_process_src.wait.return_value = 0
 
     m_process_maven = mock.Mock()
     output = (b'Downloading: /com/eng/resultsdb-0.31.0.jar\n'
               b'[====================================] 100%  23.38 KiB\n'
               b'Downloading: /com/eng/resultsdb-doc-0.51.0.jar\n'
               b'[====================================] 100%   1.49 KiB\n')
-    m_process_maven.communicate.return_value = (output, error)
-    m_process_maven.returncode = 0
+    m_process_maven.stdout = io.BytesIO(output)
+    m_process_maven.wait.return_value = 0
 
     m_process_image = mock.Mock()
-    output = (b'No image archives available for com.some.path.resultsdb-0.31.0.jar')
-    m_process_image.communicate.return_value = (output, error)
-    m_process_image.returncode = 1
+    output = b'No image archives available for com.some.path.resultsdb-0.31.0.jar'
+    m_process_image.stdout = io.BytesIO(output)
+    m_process_image.wait.return_value = 1
+
+    # The downloads run concurrently, so pick the process based on the --arch or --type option
+    processes = {
+        ('--arch', 'noarch'): m_process_noarch,
+        ('--arch', 'src'): m_process_src,
+        ('--type', 'maven'): m_process_maven,
+        ('--type', 'image'): m_process_image,
+    }
 
-    process_calls = [m_process_rpm, m_process_maven, m_process_image]
-    m_popen.side_effect = process_calls
+    def _popen(cmd, **kwargs):
+        return processes[tuple(cmd[-2:])]
+
+    m_popen.side_effect = _popen
     with mock.patch('os.path.isdir', return_value=True):
-        rv = utils.download_build({'task_id': 2, 'id': 1}, '/some/path')
+        rv = utils.download_build(
+            {'task_id': 2, 'id': 1}, '/some/path', rpms=rpms, archives=archives)
 
     assert rv == [
         '/some/path/resultsdb-2.1.0-2.el7.noarch.rpm',
@@ -244,7 +308,63 @@ def test_download_build(m_popen, m_assert_command):
         '/some/path/com/eng/resultsdb-0.31.0.jar',
         '/some/path/com/eng/resultsdb-doc-0.51.0.jar',
     ]
-    assert m_popen.call_count == 3
+    assert m_popen.call_count == 4
+    # The RPMs and archives that were passed in are used instead of listing them again
+    m_get_koji_session.assert_not_called()
+
+
+@pytest.mark.parametrize('rpms,archives,expected_type_opts', [
+    ([{'id': 1, 'arch': 'x86_64'}, {'id': 2, 'arch': 'noarch'}, {'id': 3, 'arch': 'x86_64'}], [],
+     [['--arch', 'noarch'], ['--arch', 'x86_64']]),
+    ([], [{'id': 2, 'btype': 'maven'}], [['--type', 'maven']]),
+    ([], [{'id': 3, 'btype': 'image'}, {'id': 4, 'btype': 'log'}], [['--type', 'image']]),
+    ([], [], []),
+])
+@mock.patch('assayist.processor.utils._download_build_artifacts', return_value=[])
+@mock.patch('assayist.processor.utils.assert_command')
+def test_download_build_only_existing_types(m_assert_command, m_download_build_artifacts, rpms,
+                                            archives, expected_type_opts):
+    """Test that download_build only runs the download for the artifact types the build has."""
+    with mock.patch('os.path.isdir', return_value=True):
+        assert utils.download_build({'id': 1}, '/some/path', rpms=rpms, archives=archives) == []
+
+    cmd = ['koji', '--profile', utils.config.koji_profile, 'download-build', '1']
+    assert m_download_build_artifacts.call_args_list == [
+        mock.call(cmd + type_opts, output_dir='/some/path') for type_opts in expected_type_opts]
+
+
+@mock.patch('assayist.processor.utils._download_build_artifacts', return_value=[])
+@mock.patch('assayist.processor.utils.assert_command')
+def test_download_build_max_concurrent_downloads(m_assert_command, m_download_build_artifacts):
+    """Test that download_build doesn't run more downloads at a time than the limit."""
+    arches = ('aarch64', 'i686', 'noarch', 'ppc64le', 's390x', 'src', 'x86_64')
+    rpms = [{'id': i, 'arch': arch} for i, arch in enumerate(arches)]
+    with mock.patch('concurrent.futures.ThreadPoolExecutor',
+                    wraps=concurrent.futures.ThreadPoolExecutor) as m_executor, \
+            mock.patch('os.path.isdir', return_value=True):
+        assert utils.download_build({'id': 1}, '/some/path', rpms=rpms, archives=[]) == []
+
+    m_executor.assert_called_once_with(max_workers=utils.MAX_CONCURRENT_DOWNLOADS)
+    assert m_download_build_artifacts.call_count == len(arches)
+
+
+@mock.patch('assayist.processor.utils._download_build_artifacts', return_value=[])
+@mock.patch('assayist.processor.utils.get_koji_session')
+@mock.patch('assayist.processor.utils.assert_command')
+def test_download_build_lists_artifacts(m_assert_command, m_get_koji_session,
+                                        m_download_build_artifacts):
+    """Test that download_build gets the RPMs and archives from Koji when they aren't passed."""
+    m_koji = mock.Mock()
+    m_koji.multiCall.return_value = [[[{'id': 1, 'arch': 'noarch'}]], [[]]]
+    m_get_koji_session.return_value = m_koji
+    with mock.patch('os.path.isdir', return_value=True):
+        assert utils.download_build({'id': 1}, '/some/path') == []
+
+    m_koji.listRPMs.assert_called_once_with(buildID=1)
+    m_koji.listArchives.assert_called_once_with(buildID=1)
+    cmd = ['koji', '--profile', utils.config.koji_profile, 'download-build', '1']
+    m_download_build_artifacts.assert_called_once_with(
+        cmd + ['--arch', 'noarch'], output_dir='/some/path')
 
 
 @pytest.mark.parametrize('url, expected_values', [
@@ -288,63 +408,124 @@ def test_download_source(m_popen, m_assert_command):
     assert m_process.communicate.call_count == 3
 
     m_popen.assert_has_calls([
-        mock.call(['git', 'clone', 'git://pkgs.com/containers/rsyslog', '/some/path'],
-                  stdout=subprocess.DEVNULL, stderr=subprocess.PIPE),
+        mock.call(['git', 'clone', '--no-checkout', 'git://pkgs.com/containers/rsyslog',
+                   '/some/path'],
+                  stdout=subprocess.DEVNULL, stderr=mock.ANY),
         mock.call().communicate(),
         mock.call(['git', 'reset', '--hard', '4a4109c3e85908b6899b1aa291570f7c7b5a0cb5'],
-                  cwd='/some/path', stdout=subprocess.DEVNULL, stderr=subprocess.PIPE),
+                  cwd='/some/path', stdout=subprocess.DEVNULL, stderr=mock.ANY),
         mock.call().communicate(),
         mock.call(['rhpkg', '--user=1001', 'sources'],
-                  cwd='/some/path', stdout=subprocess.DEVNULL, stderr=subprocess.PIPE),
+                  cwd='/some/path', stdout=subprocess.DEVNULL, stderr=mock.ANY),
         mock.call().communicate(),
     ])
 
 
+@mock.patch('assayist.processor.utils.libarchive', None)
+@mock.patch('fcntl.fcntl')
+@mock.patch('assayist.processor.utils.assert_command')
 @mock.patch('subprocess.Popen')
-def test_rpm_to_cpio(m_popen):
-    """Test the _rpm_to_cpio function."""
-    m_process = mock.Mock()
-    output = b'the cpio file'
-    error = b''
-    m_process.communicate.return_value = (output, error)
-    m_process.returncode = 0
-    m_popen.return_value = m_process
+def test_unpack_rpm(m_popen, m_assert_command, m_fcntl):
+    """Test the unpack_rpm function."""
+    m_rpm2cpio = mock.Mock()
+    m_rpm2cpio.returncode = 0
+    m_cpio = mock.Mock()
+    m_cpio.returncode = 0
+    m_popen.side_effect = [m_rpm2cpio, m_cpio]
     rpm_file = '/path/to/some-rpm.rpm'
-    assert utils._rpm_to_cpio(rpm_file) == output
-    m_popen.assert_called_once_with(
-        ['rpm2cpio', rpm_file], stderr=subprocess.PIPE, stdout=subprocess.PIPE)
+    output_dir = '/some/path/output/some-rpm.rpm'
 
+    utils.unpack_rpm(rpm_file, output_dir)
 
-@mock.patch('subprocess.Popen')
-def test__unpack_cpio(m_popen):
-    """Test the _unpack_cpio function."""
-    m_process = mock.Mock()
-    output = b''
-    error = b''
-    m_process.communicate.return_value = (output, error)
-    m_process.returncode = 0
-    m_popen.return_value = m_process
-    cpio_file = b'the cpio file'
-    output_dir = '/some/path'
-    assert utils._unpack_cpio(cpio_file, output_dir) is None
-    m_popen.assert_called_once_with(
-        ['cpio', '-idmv'], cwd=output_dir, stderr=subprocess.PIPE, stdin=subprocess.PIPE)
-    m_process.communicate.assert_called_once_with(input=cpio_file)
+    # The output of rpm2cpio should be piped directly to cpio
+    m_popen.assert_has_calls([
+        mock.call(['rpm2cpio', rpm_file], stdout=subprocess.PIPE, stderr=mock.ANY),
+        mock.call(['cpio', '-idm'], cwd=output_dir, stdin=m_rpm2cpio.stdout, stderr=mock.ANY),
+    ])
+    m_fcntl.assert_called_once_with(
+        m_rpm2cpio.stdout.fileno.return_value, utils.F_SETPIPE_SZ, utils.RPM_PIPE_SIZE)
+    m_rpm2cpio.stdout.close.assert_called_once_with()
+    m_rpm2cpio.wait.assert_called_once_with()
+    m_cpio.wait.assert_called_once_with()
 
 
+@pytest.mark.parametrize('rpm2cpio_returncode,cpio_returncode,failed_cmd', [
+    (1, 2, 'rpm2cpio /path/to/some-rpm.rpm'),
+    (-signal.SIGPIPE, 2, 'cpio -idm'),
+    (0, 2, 'cpio -idm'),
+])
+@mock.patch('assayist.processor.utils.libarchive', None)
+@mock.patch('fcntl.fcntl', side_effect=OSError)
+@mock.patch('assayist.processor.utils._read_error_output', return_value='some error')
 @mock.patch('assayist.processor.utils.assert_command')
-@mock.patch('assayist.processor.utils._unpack_cpio')
-@mock.patch('assayist.processor.utils._rpm_to_cpio')
-def test_unpack_rpm(m_rpm_to_cpio, m_unpack_cpio, m_assert_command):
-    """Test the unpack_rpm function."""
-    cpio = b'the cpio file'
-    m_rpm_to_cpio.return_value = cpio
-    rpm_file = '/path/to/some-rpm.rpm'
-    output_dir = '/some/path/output/some-rpm.rpm'
-    with mock.patch('os.path.isdir', return_value=False):
-        utils.unpack_rpm(rpm_file, output_dir)
-    m_rpm_to_cpio.assert_called_once_with(rpm_file)
-    m_unpack_cpio.assert_called_once_with(cpio, output_dir)
+@mock.patch('subprocess.Popen')
+def test_unpack_rpm_failed(m_popen, m_assert_command, m_read_error_output, m_fcntl,
+                           rpm2cpio_returncode, cpio_returncode, failed_cmd):
+    """Test that unpack_rpm reports the command that caused the unpacking to fail."""
+    m_rpm2cpio = mock.Mock()
+    m_rpm2cpio.returncode = rpm2cpio_returncode
+    m_cpio = mock.Mock()
+    m_cpio.returncode = cpio_returncode
+    m_popen.side_effect = [m_rpm2cpio, m_cpio]
+
+    with pytest.raises(RuntimeError) as e:
+        utils.unpack_rpm('/path/to/some-rpm.rpm', '/some/path')
+    assert str(e.value) == f'The command "{failed_cmd}" failed with: some error'
+
+
+@mock.patch('subprocess.Popen')
+@mock.patch('assayist.processor.utils.libarchive')
+def test_unpack_rpm_in_process(m_libarchive, m_popen):
+    """Test that unpack_rpm unpacks the RPM with libarchive when it's available."""
+    m_file = mock.Mock(pathname='./usr/bin/ls', islnk=False, isdir=False)
+    m_hardlink = mock.Mock(
+        pathname='./usr/bin/dir', islnk=True, isdir=False, linkpath='./usr/bin/ls')
+    m_libarchive.file_reader.return_value.__enter__.return_value = [m_file, m_hardlink]
+    m_libarchive.extract.extract_entries.side_effect = lambda entries, flags: list(entries)
+
+    utils.unpack_rpm('/path/to/some-rpm.rpm', '/some/path')
+
+    m_libarchive.file_reader.assert_called_once_with('/path/to/some-rpm.rpm')
+    m_libarchive.extract.extract_entries.assert_called_once()
+    # The entries are unpacked under the output directory without changing the current directory
+    assert m_file.pathname == '/some/path/./usr/bin/ls'
+    assert m_hardlink.pathname == '/some/path/./usr/bin/dir'
+    assert m_hardlink.linkpath == '/some/path/./usr/bin/ls'
+    m_popen.assert_not_called()
+
+
+@pytest.mark.skipif(utils.libarchive is None, reason='libarchive-c is missing or too old')
+def test_unpack_rpm_in_process_round_trip(tmpdir, monkeypatch):
+    """Test that unpack_rpm unpacks a real CPIO archive with libarchive."""
+    source_dir = tmpdir.mkdir('source')
+    bin_dir = source_dir.mkdir('usr').mkdir('bin')
+    bin_dir.join('ls').write('ls')
+    os.link(str(bin_dir.join('ls')), str(bin_dir.join('dir')))
+    os.symlink('ls', str(bin_dir.join('vdir')))
+    doc_dir = source_dir.join('usr').mkdir('doc')
+    doc_dir.join('README').write('read me')
+    doc_dir.chmod(0o555)
+    archive = str(tmpdir.join('some-rpm.cpio'))
+    monkeypatch.chdir(source_dir)
+    with utils.libarchive.file_writer(archive, 'cpio_newc') as writer:
+        # Like in RPMs, the paths are relative to the current directory
+        writer.add_files('./usr')
+        writer.add_file_from_memory('/etc/escaped', 7, b'escaped')
+
+    output_dir = tmpdir.mkdir('output')
+    # Unpack to a relative path that goes through ".."
+    monkeypatch.chdir(tmpdir.mkdir('cwd'))
+    utils.unpack_rpm(archive, '../output')
+
+    assert output_dir.join('usr', 'bin', 'ls').read() == 'ls'
+    assert os.path.samefile(
+        str(output_dir.join('usr', 'bin', 'ls')), str(output_dir.join('usr', 'bin', 'dir')))
+    assert os.readlink(str(output_dir.join('usr', 'bin', 'vdir'))) == 'ls'
+    assert output_dir.join('usr', 'doc', 'README').read() == 'read me'
+    # The read-only directory is made writable so that it can be cleaned up
+    assert os.access(str(output_dir.join('usr', 'doc')), os.W_OK)
+    # Absolute paths are unpacked under the output directory
+    assert output_dir.join('etc', 'escaped').read() == 'escaped'
 
 
 class TestContainerUnpacking:
@@ -440,6 +621,17 @@ class TestContainerUnpacking:
         with open(temp_container_dir.join('output').join('a')) as f:
             assert f.read() == '09085539f'
 
+    def test_file_without_manifest(self, tmpdir):
+        """Test the unpack_container_image function with an image that has no manifest.json."""
+        layer_path = pathlib.Path(tmpdir.join('layer.tar'))
+        layer_path.write_text('not really a layer')
+        image_path = tmpdir.join('docker-image:sha456.tar.gz')
+        with tarfile.open(image_path, mode='w:gz') as archive:
+            archive.add(layer_path, arcname='012cd57ae/layer.tar')
+
+        with pytest.raises(RuntimeError, match='has no manifest.json'):
+            utils.unpack_container_image(image_path, tmpdir.join('output'))
+
 
 def _mocked_iszipfile(filename):
     return '.jar' in filename
@@ -462,29 +654,105 @@ def test_unpack_artifacts(m_unpack_tar, m_unpack_zip, m_unpack_container_image,
     artifacts = ['/path/to/some-rpm.rpm', '/path/to/some-rpm.src.rpm',
                  'path/to/some-jar.jar',
                  'path/to/docker-image:123.tar.gz',
-                 'path/to/some-tar-file.tar']
+                 'path/to/some-tar-file.tar',
+                 # The mocked zipfile.is_zipfile returns False for this, so it must be unpacked
+                 # based on its extension alone
+                 'path/to/some-war.war',
+                 'path/to/some-pom.pom']
     output_dir = '/path/to/output'
 
     with mock.patch('os.path.isdir', return_value=True):
-        with mock.patch('os.path.isfile', return_value=True):
+        with mock.patch('assayist.processor.utils._get_existing_files') as m_get_existing_files:
+            m_get_existing_files.return_value = set(artifacts)
             utils.unpack_artifacts(artifacts, output_dir)
 
     rpm_dirs = [f'{output_dir}/rpm/some-rpm.rpm', f'{output_dir}/rpm/some-rpm.src.rpm']
     container_dir = f'{output_dir}/container_layer/docker-image:123.tar.gz'
-    non_rpm_dirs = [f'{output_dir}/non-rpm/some-jar.jar', f'{output_dir}/non-rpm/some-tar-file.tar']
+    non_rpm_dirs = [f'{output_dir}/non-rpm/some-jar.jar', f'{output_dir}/non-rpm/some-tar-file.tar',
+                    f'{output_dir}/non-rpm/some-war.war']
 
+    # The artifacts are unpacked concurrently, so the order of the calls isn't guaranteed
     m_unpack_rpm.assert_has_calls([
         mock.call(artifacts[0], rpm_dirs[0]),
         mock.call(artifacts[1], rpm_dirs[1]),
-    ])
-    m_unpack_zip.assert_called_once_with(artifacts[2], non_rpm_dirs[0])
+    ], any_order=True)
+    m_unpack_zip.assert_has_calls([
+        mock.call(artifacts[2], non_rpm_dirs[0]),
+        mock.call(artifacts[5], non_rpm_dirs[2]),
+    ], any_order=True)
     m_unpack_container_image.assert_called_once_with(artifacts[3], container_dir)
     m_unpack_tar.assert_called_once_with(artifacts[4], non_rpm_dirs[1])
 
     m_makedirs.assert_has_calls(
         [mock.call(rpm_dirs[0]), mock.call(rpm_dirs[1]), mock.call(non_rpm_dirs[0]),
-         mock.call(container_dir), mock.call(non_rpm_dirs[1])]
+         mock.call(container_dir), mock.call(non_rpm_dirs[1]), mock.call(non_rpm_dirs[2])]
     )
+    assert m_makedirs.call_count == 6
+
+
+@mock.patch('os.makedirs')
+@mock.patch('assayist.processor.utils.unpack_rpm')
+def test_unpack_artifacts_failed(m_unpack_rpm, m_makedirs):
+    """Test that unpack_artifacts raises the error of an artifact that failed to unpack."""
+    artifacts = ['/path/to/some-rpm.rpm', '/path/to/other-rpm.rpm']
+    m_unpack_rpm.side_effect = [None, RuntimeError('The command "cpio -idm" failed with: oops')]
+
+    with mock.patch('os.path.isdir', return_value=True):
+        with mock.patch('assayist.processor.utils._get_existing_files') as m_get_existing_files:
+            m_get_existing_files.return_value = set(artifacts)
+            with pytest.raises(RuntimeError, match='oops'):
+                utils.unpack_artifacts(artifacts, '/path/to/output')
+
+    assert m_unpack_rpm.call_count == 2
+
+
+def test_unpack_artifacts_invalid_archive(tmpdir):
+    """Test that unpack_artifacts skips archives that turn out to be invalid."""
+    files_dir = tmpdir.mkdir('files')
+    with zipfile.ZipFile(str(files_dir.join('some-jar.jar')), 'w') as jar:
+        jar.writestr('META-INF/MANIFEST.MF', 'Manifest-Version: 1.0\n')
+    files_dir.join('not-a-jar.jar').write('not a ZIP file')
+    files_dir.join('not-a-tar.tar.gz').write('not a TAR file')
+    artifacts = [str(files_dir.join(name))
+                 for name in ('some-jar.jar', 'not-a-jar.jar', 'not-a-tar.tar.gz')]
+    output_dir = tmpdir.mkdir('output')
+
+    utils.unpack_artifacts(artifacts, str(output_dir))
+
+    assert output_dir.join('non-rpm', 'some-jar.jar', 'META-INF', 'MANIFEST.MF').check()
+    assert not output_dir.join('non-rpm', 'not-a-jar.jar').check()
+    assert not output_dir.join('non-rpm', 'not-a-tar.tar.gz').check()
+
+
+def test_unpack_artifacts_missing_artifact():
+    """Test that unpack_artifacts fails when an artifact doesn't exist."""
+    with mock.patch('os.path.isdir', return_value=True):
+        with mock.patch('assayist.processor.utils._get_existing_files', return_value=set()):
+            with pytest.raises(RuntimeError, match='could not be found'):
+                utils.unpack_artifacts(['/path/to/some-rpm.rpm'], '/path/to/output')
+
+
+@pytest.mark.parametrize('filename,expected', [
+    ('some-rpm.src.rpm', '.rpm'),
+    ('some-tar-file.tar', '.tar'),
+    ('some-tar-file.tar.gz', '.tar.gz'),
+    ('some-gem-1.0.gem', '.gem'),
+    ('README', ''),
+])
+def test_get_extension(filename, expected):
+    """Test that _get_extension keeps the ".tar" of compressed TAR archives."""
+    assert utils._get_extension(filename) == expected
+
+
+def test_get_existing_files(tmpdir):
+    """Test that _get_existing_files only returns the paths to existing files."""
+    tmpdir.join('some-rpm.rpm').write('')
+    tmpdir.mkdir('com').join('some-jar.jar').write('')
+    tmpdir.mkdir('some-dir.rpm')
+    paths = [str(tmpdir.join(path)) for path in (
+        'some-rpm.rpm', 'com/some-jar.jar', 'some-dir.rpm', 'missing.rpm', 'missing/some.jar')]
+
+    assert utils._get_existing_files(paths) == set(paths[0:2])
 
 
 @pytest.mark.parametrize('build_info,task_request,expected', [
@@ -498,11 +766,21 @@ def test_unpack_artifacts(m_unpack_tar, m_unpack_zip, m_unpack_container_image,
         ['red', 'git://domain.local/rpms/pkg', 'sox'],
         'git://domain.local/rpms/pkg'
     ),
+    (
+        {'id': 1, 'source': None, 'task_id': 123},
+        ['https://domain.local/not-git', 'git+https://domain.local/rpms/pkg'],
+        'git+https://domain.local/rpms/pkg'
+    ),
     (
         {'id': 1, 'source': None, 'task_id': 123},
         ['red', {'ksurl': 'git://domain.local/rpms/pkg', 'red': 'sox'}, 'green'],
         'git://domain.local/rpms/pkg'
     ),
+    (
+        {'id': 1, 'source': None, 'task_id': 123},
+        [{'ksurl': None, 'indirection_template_url': 'git://domain.local/rpms/pkg'}],
+        'git://domain.local/rpms/pkg'
+    ),
 ])
 @mock.patch('assayist.processor.utils.get_koji_session')
 def test_get_source_of_build(mock_session, build_info, task_request, expected):